@@ -1,7 +1,11 @@
 import os
 import re
-import pickle
+import threading
+from collections import OrderedDict
+import ahocorasick
 import faiss
+import numpy as np
+import pyarrow.feather as feather
 import streamlit as st
 from sentence_transformers import SentenceTransformer
 
@@ -9,10 +13,27 @@ from sentence_transformers import SentenceTransformer
 # Files
 # =========================
 INDEX_FILE = os.path.join("data", "faiss_index.bin")
-META_FILE = os.path.join("data", "faiss_meta.pkl")
+META_FILE = os.path.join("data", "meta.feather")
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# int8 ONNX export shipped with the model repo (run by ONNX Runtime instead of PyTorch)
+MODEL_BACKEND = "onnx"
+ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
 
 TOP_K = 20
+EF_SEARCH = 64  # HNSW search breadth (recall vs latency)
+# map the index file instead of copying it to the heap (page cache shared by all workers);
+# IO_FLAG_MMAP alone only maps IVF lists, HNSW/flat codes need the zero-copy reader
+INDEX_IO_FLAGS = (
+    faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+)
+# batched FAISS search scales with physical cores (hyperthreads just share bandwidth);
+# a single query doesn't benefit from OpenMP at all
+FAISS_THREADS = max(1, (os.cpu_count() or 2) // 2)
+ENCODE_BATCH_SIZE = 32
+SEARCH_CACHE_SIZE = 1024
+# subtracted from the total of every hit that comes only from the previous user turn;
+# sized against the quality range (-2 .. 6.3) so it outweighs ~8 GOOD hints
+HISTORY_PENALTY = 2.0
 
 # =========================
 # Intent Filter
@@ -24,33 +45,105 @@ UBUNTU_INTENT_HINTS = [
     "bash", "permission", "mount", "disk", "snap", "repo", "dependency"
 ]
 
+INTENT_RE = re.compile("|".join(re.escape(h) for h in UBUNTU_INTENT_HINTS), re.IGNORECASE)
+
 def is_ubuntu_question(q: str) -> bool:
-    q = q.lower().strip()
-    return any(h in q for h in UBUNTU_INTENT_HINTS)
+    return bool(INTENT_RE.search(q))
 
 # =========================
 # Load assets (cached)
 # =========================
 @st.cache_resource
 def load_assets():
-    index = faiss.read_index(INDEX_FILE)
-    with open(META_FILE, "rb") as f:
-        meta = pickle.load(f)
-    model = SentenceTransformer(MODEL_NAME)
+    index = faiss.read_index(INDEX_FILE, INDEX_IO_FLAGS)
+    index.hnsw.efSearch = EF_SEARCH
+    meta = feather.read_table(META_FILE, memory_map=True)
+    model = SentenceTransformer(
+        MODEL_NAME,
+        backend=MODEL_BACKEND,
+        model_kwargs={"file_name": ONNX_FILE}
+    )
     return index, meta, model
 
-def search(query: str, index, meta, model, top_k=TOP_K):
-    q_emb = model.encode([query], normalize_embeddings=True)
+# per-query LRU: (query_norm, top_k) -> read-only (scores_row, ids_row)
+_SEARCH_CACHE = OrderedDict()
+_SEARCH_CACHE_LOCK = threading.Lock()  # Streamlit runs sessions in threads
+
+def _cached_search(query_norm: str, top_k: int):
+    # cached FAISS row for one query, or None on a miss
+    key = (query_norm, top_k)
+    with _SEARCH_CACHE_LOCK:
+        row = _SEARCH_CACHE.get(key)
+        if row is not None:
+            _SEARCH_CACHE.move_to_end(key)
+    return row
+
+def _encode_search(queries_norm, top_k, index, model):
+    # one encode + one FAISS call for all misses (FAISS parallelizes over rows)
+    q_emb = model.encode(
+        queries_norm,
+        batch_size=ENCODE_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=False  # the model's own Normalize module already returns unit vectors
+    )
+    faiss.omp_set_num_threads(1 if len(queries_norm) == 1 else FAISS_THREADS)
     scores, ids = index.search(q_emb, top_k)
 
-    results = []
-    for sim, idx in zip(scores[0], ids[0]):
-        results.append({
-            "sim": float(sim),
-            "matched_query": meta["queries"][idx],
-            "answer": meta["answers"][idx],
-        })
-    return results
+    # read-only: cached rows are shared by every caller
+    scores.setflags(write=False)
+    ids.setflags(write=False)
+    rows = list(zip(scores, ids))
+
+    with _SEARCH_CACHE_LOCK:
+        for q, row in zip(queries_norm, rows):
+            _SEARCH_CACHE[(q, top_k)] = row
+            _SEARCH_CACHE.move_to_end((q, top_k))
+        while len(_SEARCH_CACHE) > SEARCH_CACHE_SIZE:
+            _SEARCH_CACHE.popitem(last=False)
+    return rows
+
+def _gather(meta, sims, ids):
+    # columnar results: sims/ids stay NumPy, text stays Arrow (C-level gather);
+    # Python strings are only built for the rows that get scored or shown
+    keep = ids >= 0  # FAISS pads with -1 when it finds fewer than top_k
+    ids = ids[keep]
+    return {
+        "sim": sims[keep],
+        "ids": ids,
+        "matched_query": meta.column("q").take(ids),
+        "answer": meta.column("a").take(ids),
+    }
+
+def search_batch(queries, index, meta, model, top_k=TOP_K):
+    # MiniLM is uncased, so lowercasing only widens cache hits
+    queries_norm = [q.strip().lower() for q in queries]
+
+    # cache hits per query; the misses (deduped) are encoded and searched together
+    rows = {q: _cached_search(q, top_k) for q in dict.fromkeys(queries_norm)}
+    misses = [q for q, row in rows.items() if row is None]
+    if misses:
+        rows.update(zip(misses, _encode_search(misses, top_k, index, model)))
+
+    return [_gather(meta, *rows[q]) for q in queries_norm]
+
+def search(query: str, index, meta, model, top_k=TOP_K):
+    return search_batch([query], index, meta, model, top_k)[0]
+
+def merge_history(cur, prev, meta, served_id=None):
+    # add the previous turn's hits that the current query didn't find, with a
+    # penalty on their total; the answer already served for the previous turn is
+    # not re-added through history (the current query's own hits are untouched)
+    fresh = ~np.isin(prev["ids"], cur["ids"])
+    if served_id is not None:
+        fresh &= prev["ids"] != served_id
+
+    ids = np.concatenate((cur["ids"], prev["ids"][fresh]))
+    sims = np.concatenate((cur["sim"], prev["sim"][fresh]))
+    penalty = np.concatenate((np.zeros(len(cur["ids"])), np.full(int(fresh.sum()), HISTORY_PENALTY)))
+
+    merged = _gather(meta, sims, ids)
+    merged["penalty"] = penalty
+    return merged
 
 # =========================
 # Reranking
@@ -63,6 +156,7 @@ BAD_PATTERNS = [
     r"\bask on\b",
     r"\birssi\b",
 ]
+BAD_PATTERNS_RE = [re.compile(p) for p in BAD_PATTERNS]
 
 GOOD_HINTS = [
     "sudo", "apt", "apt-get", "dpkg", "systemctl", "service", "nmcli",
@@ -70,60 +164,89 @@ GOOD_HINTS = [
     "reboot", "restart", "update", "upgrade", "install",
     "kernel", "driver", "dependency", "failed", "error"
 ]
+STEP_WORDS = ["try", "run", "check", "type", "command"]
 
-def answer_quality(ans: str) -> float:
-    a = (ans or "").lower().strip()
-
-    for pat in BAD_PATTERNS:
-        if re.search(pat, a):
-            return -2.0
-
-    score = 0.0
-    for g in GOOD_HINTS:
-        if g in a:
-            score += 0.25
-
-    L = len(a)
-    if 30 <= L <= 350:
-        score += 0.5
-    elif L < 15:
-        score -= 0.5
-    elif L > 600:
-        score -= 0.3
-
-    if any(x in a for x in ["try", "run", "check", "type", "command"]):
-        score += 0.3
+GOOD_SET = frozenset(GOOD_HINTS)
+STEP_SET = frozenset(STEP_WORDS)
 
-    return score
+# one automaton for all plain-text hints: a single pass over the answer reports every hit
+HINTS_AUTOMATON = ahocorasick.Automaton()
+for w in GOOD_SET | STEP_SET:
+    HINTS_AUTOMATON.add_word(w, w)
+HINTS_AUTOMATON.make_automaton()
 
-def pick_best(results):
-    best = None
-    best_total = -999.0
-
-    for r in results:
-        r["qual"] = answer_quality(r["answer"])
-        r["total"] = r["sim"] + r["qual"]
-        if r["total"] > best_total:
-            best_total = r["total"]
-            best = r
+def answer_features(ans: str):
+    # (bad, good hint count, length, has step word) from one pass over the answer
+    a = (ans or "").lower().strip()
 
-    ranked = sorted(results, key=lambda x: x["total"], reverse=True)
+    for pat in BAD_PATTERNS_RE:
+        if pat.search(a):
+            return 1, 0, len(a), 0
+
+    hits = {w for _, w in HINTS_AUTOMATON.iter(a)}
+    return 0, len(hits & GOOD_SET), len(a), int(bool(hits & STEP_SET))
+
+def quality_batch(answers) -> np.ndarray:
+    feats = np.array([answer_features(a) for a in answers], dtype=np.int64).reshape(-1, 4)
+    bad, n_good, L, step = feats.T
+
+    score = 0.25 * n_good
+    score += np.select(
+        [(L >= 30) & (L <= 350), L < 15, L > 600],
+        [0.5, -0.5, -0.3],
+        0.0
+    )
+    score += np.where(step == 1, 0.3, 0.0)
+
+    return np.where(bad == 1, -2.0, score)
+
+def result_row(results, i, qual, total):
+    return {
+        "id": int(results["ids"][i]),
+        "sim": float(results["sim"][i]),
+        "matched_query": results["matched_query"][i].as_py(),
+        "answer": results["answer"][i].as_py(),
+        "qual": qual,
+        "total": total,
+    }
+
+def pick_best(results, rank=True):
+    sims = results["sim"].astype(np.float64)
+    quals = quality_batch(results["answer"].to_pylist())
+    totals = sims + quals
+    if "penalty" in results:
+        totals = totals - results["penalty"]
+
+    top = int(totals.argmax())
+    best = result_row(results, top, float(quals[top]), float(totals[top]))
+
+    # full sort (and a dict per row) only when the caller shows the ranking
+    ranked = None
+    if rank:
+        ranked = [
+            result_row(results, int(i), float(quals[i]), float(totals[i]))
+            for i in np.argsort(-totals, kind="stable")
+        ]
     return best, ranked
 
 # =========================
 # Command extraction (clean)
 # =========================
+SPLIT_RE = re.compile(r",|&&|\.\s+")
+RUN_PREFIX_RE = re.compile(r"^\s*run\s+", re.IGNORECASE)
+
+CMD_KEYWORDS = [
+    "sudo", "apt-get", "apt ", "nmcli", "ifconfig", "iwconfig",
+    "lspci", "lsusb", "dmesg", "systemctl", "rfkill", "netplan"
+]
+CMD_RE = re.compile("|".join(re.escape(k) for k in CMD_KEYWORDS))
+
 def extract_commands(text: str):
     if not text:
         return []
 
     t = text.strip()
-    parts = re.split(r",|&&|\.\s+", t)
-
-    cmd_keywords = [
-        "sudo", "apt-get", "apt ", "nmcli", "ifconfig", "iwconfig",
-        "lspci", "lsusb", "dmesg", "systemctl", "rfkill", "netplan"
-    ]
+    parts = SPLIT_RE.split(t)
 
     commands = []
     for p in parts:
@@ -132,10 +255,13 @@ def extract_commands(text: str):
             continue
 
         low = p.lower()
-        if any(k in low for k in cmd_keywords):
-            p = re.sub(r"^\s*run\s+", "", p, flags=re.IGNORECASE)
+        if CMD_RE.search(low):
+            # the "run " prefix is ASCII, so the same cut applies to the lowered copy
+            m = RUN_PREFIX_RE.match(p)
+            if m:
+                p, low = p[m.end():], low[m.end():]
 
-            if p.lower().startswith(("apt-get", "apt ")):
+            if low.startswith(("apt-get", "apt ")):
                 p = "sudo " + p
 
             if len(p) >= 5:
@@ -144,14 +270,7 @@ def extract_commands(text: str):
     if "reboot" in t.lower():
         commands.append("sudo reboot")
 
-    seen = set()
-    unique = []
-    for c in commands:
-        if c not in seen:
-            unique.append(c)
-            seen.add(c)
-
-    return unique[:8]
+    return list(dict.fromkeys(commands))[:8]
 
 def format_support_answer(best_answer: str) -> str:
     cmds = extract_commands(best_answer)
@@ -189,12 +308,22 @@ index, meta, model = load_assets()
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# queries waiting to be answered (drained as one batch)
+if "pending" not in st.session_state:
+    st.session_state.pending = []
+
+# answer id served for each user turn (None for turns that weren't searched)
+if "served" not in st.session_state:
+    st.session_state.served = []
+
 col1, col2 = st.columns([4, 1])
 with col1:
     user_q = st.text_input("Ask an Ubuntu support question:", key="user_input")
 with col2:
     if st.button("Clear Chat"):
         st.session_state.messages = []
+        st.session_state.pending = []
+        st.session_state.served = []
         st.rerun()
 
 
@@ -202,20 +331,46 @@ if st.button("Send"):
     if user_q.strip():
         # store user message
         st.session_state.messages.append(("user", user_q.strip()))
+        st.session_state.pending.append(user_q.strip())
 
-        # assistant response
-        if not is_ubuntu_question(user_q):
-            bot_msg = (
-                "🤖 I can only help with **Ubuntu / Linux technical support** questions.\n\n"
-                "Try: `wifi not working after update` or `apt-get update failed`."
-            )
-        else:
-            results = search(user_q, index, meta, model)
-            best, ranked = pick_best(results)
-            bot_msg = format_support_answer(best["answer"])
+if st.session_state.pending:
+    pending = st.session_state.pending
+    st.session_state.pending = []
 
+    # assistant responses: each question is searched together with the user
+    # turn before it, all in one batch
+    user_turns = [m for role, m in st.session_state.messages if role == "user"]
+    offset = len(user_turns) - len(pending)
+
+    jobs = []
+    for i, q in enumerate(pending):
+        if not is_ubuntu_question(q):
+            continue
+        prev = user_turns[offset + i - 1] if offset + i > 0 else None
+        jobs.append((i, q, prev if prev and is_ubuntu_question(prev) else None))
+
+    served = st.session_state.served
+    served.extend([None] * (len(user_turns) - len(served)))
+
+    answers = {}
+    if jobs:
+        flat = list(dict.fromkeys(x for _, q, prev in jobs for x in (q, prev) if x))
+        found = dict(zip(flat, search_batch(flat, index, meta, model)))
+        for i, q, prev in jobs:
+            results = found[q]
+            if prev:
+                results = merge_history(results, found[prev], meta, served[offset + i - 1])
+            best, _ = pick_best(results, rank=False)
+            served[offset + i] = best["id"]
+            answers[q] = format_support_answer(best["answer"])
+
+    for q in pending:
+        bot_msg = answers.get(q) or (
+            "🤖 I can only help with **Ubuntu / Linux technical support** questions.\n\n"
+            "Try: `wifi not working after update` or `apt-get update failed`."
+        )
         st.session_state.messages.append(("bot", bot_msg))
-        st.rerun()
+    st.rerun()
 
 
 # display chat
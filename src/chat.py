@@ -1,14 +1,14 @@
 import os
 import re
-import pickle
 import faiss
+import pyarrow.feather as feather
 from sentence_transformers import SentenceTransformer
 
 # =========================
 # Files
 # =========================
 INDEX_FILE = os.path.join("data", "faiss_index.bin")
-META_FILE = os.path.join("data", "faiss_meta.pkl")
+META_FILE = os.path.join("data", "meta.feather")
 
 # =========================
 # Model
@@ -19,6 +19,7 @@ MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 # Retrieval / Debug
 # =========================
 TOP_K_RETRIEVE = 20
+EF_SEARCH = 64  # HNSW search breadth (recall vs latency)
 SHOW_DEBUG = False
 
 MIN_TOTAL_SCORE = 1.10
@@ -38,6 +39,7 @@ BAD_PATTERNS = [
     r"\bask in\b",
     r"\bgo to #\b",
 ]
+BAD_PATTERNS_RE = [re.compile(p) for p in BAD_PATTERNS]
 
 GOOD_HINTS = [
     "sudo", "apt", "apt-get", "dpkg", "systemctl", "service", "nmcli",
@@ -53,9 +55,10 @@ UBUNTU_INTENT_HINTS = [
     "bash", "permission", "mount", "disk"
 ]
 
+INTENT_RE = re.compile("|".join(re.escape(h) for h in UBUNTU_INTENT_HINTS), re.IGNORECASE)
+
 def is_ubuntu_question(q: str) -> bool:
-    q = q.lower().strip()
-    return any(h in q for h in UBUNTU_INTENT_HINTS)
+    return bool(INTENT_RE.search(q))
 
 
 # =========================
@@ -68,8 +71,8 @@ def load():
         raise FileNotFoundError(f"Missing metadata file: {META_FILE}")
 
     index = faiss.read_index(INDEX_FILE)
-    with open(META_FILE, "rb") as f:
-        meta = pickle.load(f)
+    index.hnsw.efSearch = EF_SEARCH
+    meta = feather.read_table(META_FILE, memory_map=True)
 
     model = SentenceTransformer(MODEL_NAME)
     return index, meta, model
@@ -82,8 +85,8 @@ def answer_quality_score(ans: str) -> float:
     a = (ans or "").lower().strip()
 
     # hard penalty for chat/noise patterns
-    for pat in BAD_PATTERNS:
-        if re.search(pat, a):
+    for pat in BAD_PATTERNS_RE:
+        if pat.search(a):
             return -2.0
 
     score = 0.0
@@ -118,10 +121,12 @@ def search(query: str, index, meta, model, top_k=TOP_K_RETRIEVE):
 
     results = []
     for sim, idx in zip(scores[0], ids[0]):
+        if idx < 0:
+            continue  # HNSW pads with -1 when it finds fewer than top_k
         results.append({
             "sim": float(sim),
-            "matched_query": meta["queries"][idx],
-            "answer": meta["answers"][idx],
+            "matched_query": meta.column("q")[int(idx)].as_py(),
+            "answer": meta.column("a")[int(idx)].as_py(),
         })
     return results
 
@@ -150,17 +155,21 @@ def pick_best(results):
 # =========================
 # Extract commands (clean)
 # =========================
+SPLIT_RE = re.compile(r",|&&|\.\s+")
+RUN_PREFIX_RE = re.compile(r"^\s*run\s+", re.IGNORECASE)
+
+CMD_KEYWORDS = [
+    "sudo", "apt-get", "apt ", "nmcli", "ifconfig", "iwconfig",
+    "lspci", "lsusb", "dmesg", "systemctl", "rfkill", "netplan"
+]
+CMD_RE = re.compile("|".join(re.escape(k) for k in CMD_KEYWORDS))
+
 def extract_commands(text: str):
     if not text:
         return []
 
     t = text.strip()
-    parts = re.split(r",|&&|\.\s+", t)
-
-    cmd_keywords = [
-        "sudo", "apt-get", "apt ", "nmcli", "ifconfig", "iwconfig",
-        "lspci", "lsusb", "dmesg", "systemctl", "rfkill", "netplan"
-    ]
+    parts = SPLIT_RE.split(t)
 
     commands = []
 
@@ -171,12 +180,14 @@ def extract_commands(text: str):
 
         low = p.lower()
 
-        if any(k in low for k in cmd_keywords):
-            #  remove leading "run "
-            p = re.sub(r"^\s*run\s+", "", p, flags=re.IGNORECASE)
+        if CMD_RE.search(low):
+            #  remove leading "run " (ASCII, so the same cut applies to the lowered copy)
+            m = RUN_PREFIX_RE.match(p)
+            if m:
+                p, low = p[m.end():], low[m.end():]
 
             #  add sudo if apt/apt-get without sudo
-            if p.lower().startswith(("apt-get", "apt ")):
+            if low.startswith(("apt-get", "apt ")):
                 p = "sudo " + p
 
             if len(p) >= 5:
@@ -187,14 +198,7 @@ def extract_commands(text: str):
         commands.append("sudo reboot")
 
     # remove duplicates preserving order
-    seen = set()
-    unique = []
-    for c in commands:
-        if c not in seen:
-            unique.append(c)
-            seen.add(c)
-
-    return unique[:8]
+    return list(dict.fromkeys(commands))[:8]
 
 
 # =========================
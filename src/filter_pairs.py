@@ -22,19 +22,21 @@ def normalize(s: str) -> str:
     s = re.sub(r"\s+", " ", s)
     return s
 
-def has_tech_signal(text: str) -> bool:
-    t = text.lower()
-    return any(w in t for w in TECH_HINTS) or ("sudo " in t) or ("apt " in t) or ("error" in t)
+# one alternation -> pandas runs the whole column through the regex engine
+# ("sudo ", "apt " and "error" are already covered by the hints)
+TECH_RE = re.compile("|".join(re.escape(w) for w in TECH_HINTS), re.IGNORECASE)
 
-def looks_like_noise(text: str) -> bool:
-    t = text.lower()
+def has_tech_signal(s: pd.Series) -> pd.Series:
+    return s.str.contains(TECH_RE, na=False)
+
+def looks_like_noise(s: pd.Series) -> pd.Series:
     # روابط كتير أو ايميلات
-    if t.count("http") >= 1:
-        return True
+    has_link = s.str.contains("http", case=False, regex=False, na=False)
     # جملة كلها رموز
-    if sum(c.isalnum() for c in t) / max(len(t), 1) < 0.55:
-        return True
-    return False
+    # [^\W_] is str.isalnum under Python's re; object dtype keeps it on that engine
+    # (Arrow-backed strings use RE2, where \w is ASCII only)
+    alnum_ratio = s.astype(object).str.count(r"[^\W_]") / s.str.len().clip(lower=1)
+    return has_link | (alnum_ratio < 0.55)
 
 def main():
     df = pd.read_csv(INPUT_FILE)
@@ -48,11 +50,11 @@ def main():
     df = df[df["answer"].str.len().between(MIN_A_LEN, MAX_LEN)]
 
     # remove noisy rows
-    df = df[~df["query"].map(looks_like_noise)]
-    df = df[~df["answer"].map(looks_like_noise)]
+    df = df[~looks_like_noise(df["query"])]
+    df = df[~looks_like_noise(df["answer"])]
 
     # keep only rows with tech signal in query OR answer
-    df = df[df.apply(lambda r: has_tech_signal(r["query"]) or has_tech_signal(r["answer"]), axis=1)]
+    df = df[has_tech_signal(df["query"]) | has_tech_signal(df["answer"])]
 
     df = df.drop_duplicates()
 
@@ -1,7 +1,6 @@
 import os
 import re
 import pandas as pd
-from tqdm import tqdm
 
 INPUT_FILE = os.path.join("data", "dialogueText.csv")   
 OUTPUT_FILE = os.path.join("data", "pairs_clean.csv")
@@ -20,42 +19,33 @@ def clean_text(s: str) -> str:
     s = re.sub(r"^\[.*?\]\s*", "", s)   
     return s.strip()
 
-def is_bad_utterance(s: str) -> bool:
-    if not s:
-        return True
-    low = s.lower().strip()
-    if low in BAD_SHORT:
-        return True
-    if len(low) < MIN_LEN_Q:
-        return True
-    # too many symbols
-    if sum(c.isalnum() for c in low) / max(len(low), 1) < 0.5:
-        return True
-    return False
+def is_bad_utterance(s: pd.Series) -> pd.Series:
+    low = s.str.lower().str.strip()
+    n = low.str.len()
+    # too many symbols ([^\W_] is str.isalnum; object dtype keeps Python's re engine)
+    alnum = low.astype(object).str.count(r"[^\W_]")
+    return (n == 0) | low.isin(BAD_SHORT) | (n < MIN_LEN_Q) | (alnum / n.clip(lower=1) < 0.5)
 
 def build_pairs(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df["text"] = df["text"].map(clean_text)
     df = df.dropna(subset=["dialogueID", "from", "text"])
     df = df.sort_values(["dialogueID", "date"])
-
-    pairs = []
-    # group per dialogue
-    for did, g in tqdm(df.groupby("dialogueID"), total=df["dialogueID"].nunique()):
-        msgs = g[["from", "text"]].values
-        for i in range(len(msgs) - 1):
-            speaker1, q = msgs[i]
-            speaker2, a = msgs[i + 1]
-
-            if speaker1 == speaker2:
-                continue  # same speaker, skip
-
-            if is_bad_utterance(q) or is_bad_utterance(a):
-                continue
-
-            pairs.append((q, a))
-
-    out = pd.DataFrame(pairs, columns=["query", "answer"])
+    df["bad"] = is_bad_utterance(df["text"])
+
+    # pair every message with the next one in the same dialogue
+    nxt = df.groupby("dialogueID")[["from", "text", "bad"]].shift(-1)
+    keep = (
+        nxt["text"].notna()                 # last message has no reply
+        & (df["from"] != nxt["from"])       # same speaker, skip
+        & ~df["bad"]
+        & ~nxt["bad"].fillna(True).astype(bool)
+    )
+
+    out = pd.DataFrame({
+        "query": df.loc[keep, "text"].to_numpy(),
+        "answer": nxt.loc[keep, "text"].to_numpy(),
+    })
     return out
 
 def main():
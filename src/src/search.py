@@ -1,18 +1,19 @@
 import os
-import pickle
 import faiss
+import pyarrow.feather as feather
 from sentence_transformers import SentenceTransformer
 
 INDEX_FILE = os.path.join("data", "faiss_index.bin")
-META_FILE = os.path.join("data", "faiss_meta.pkl")
+META_FILE = os.path.join("data", "meta.feather")
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K = 5
+EF_SEARCH = 64  # HNSW search breadth (recall vs latency)
 
 def load():
     index = faiss.read_index(INDEX_FILE)
-    with open(META_FILE, "rb") as f:
-        meta = pickle.load(f)
+    index.hnsw.efSearch = EF_SEARCH
+    meta = feather.read_table(META_FILE, memory_map=True)
     model = SentenceTransformer(MODEL_NAME)
     return index, meta, model
 
@@ -22,10 +23,12 @@ def search(query: str, index, meta, model, top_k=TOP_K):
 
     results = []
     for score, idx in zip(scores[0], ids[0]):
+        if idx < 0:
+            continue  # HNSW pads with -1 when it finds fewer than top_k
         results.append({
             "score": float(score),
-            "matched_query": meta["queries"][idx],
-            "answer": meta["answers"][idx]
+            "matched_query": meta.column("q")[int(idx)].as_py(),
+            "answer": meta.column("a")[int(idx)].as_py()
         })
     return results
 